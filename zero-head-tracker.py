@@ -9,11 +9,167 @@ from tkinter import ttk
 import threading
 import queue
 
+class QualityGovernor:
+    """Steps tracking quality down or up to keep per-frame processing time within a target budget
+    
+    Stepping up uses the cost ratio measured the last time a level was stepped
+    down from, so a level that was just shown to be over budget isn't retried
+    until the current cost leaves room for it. Without this, any step down that
+    saves more than the upgrade margin (e.g. dropping refine_landmarks) would
+    bounce back and forth, rebuilding FaceMesh on every swap.
+    
+    Ratios come from single windows, so they are clamped and expire. Once a
+    ratio expires the level gets a trial step up, and if it goes over budget
+    again the ratio is re-measured with a longer lifetime. A load spike can
+    only hold quality down until its ratio expires.
+    """
+    # Largest cost ratio trusted from one measurement window
+    MAX_COST_RATIO = 3.0
+    
+    # Ordered from best quality to cheapest. Each level only gives up one more thing.
+    # Input resolution isn't a level: FaceMesh runs its models on fixed-size
+    # inputs, so downscaling the frame first costs more than it saves.
+    LEVELS = [
+        {'name': 'High', 'refine_landmarks': True, 'overlay': True, 'preview_interval': 1},
+        {'name': 'Medium', 'refine_landmarks': False, 'overlay': True, 'preview_interval': 1},
+        {'name': 'Low', 'refine_landmarks': False, 'overlay': True, 'preview_interval': 2},
+        {'name': 'Very Low', 'refine_landmarks': False, 'overlay': False, 'preview_interval': 2},
+        {'name': 'Minimal', 'refine_landmarks': False, 'overlay': False, 'preview_interval': 4},
+    ]
+    
+    def __init__(self, target_fps=30, window_size=30, upgrade_ratio=0.6,
+                 degrade_cooldown=2.0, upgrade_cooldown=5.0):
+        self.target_fps = target_fps
+        self.enabled = True
+        self.level = 0
+        
+        # Rolling per-frame processing times (seconds)
+        self.samples = deque(maxlen=window_size)
+        
+        # Hysteresis: only step up when comfortably under budget, and wait
+        # longer before stepping up than before stepping down
+        self.upgrade_ratio = upgrade_ratio
+        self.degrade_cooldown = degrade_cooldown
+        self.upgrade_cooldown = upgrade_cooldown
+        self.last_change = time.time()
+        
+        # Measured cost of each level relative to the level below it as
+        # {level: (ratio, expires_at)}, the lifetime the next measurement of
+        # each level gets, and the average that caused the most recent step
+        # down (level, average)
+        self.cost_ratios = {}
+        self.ratio_lifetimes = {}
+        self.pending_step_down = None
+    
+    @property
+    def budget(self):
+        """Per-frame processing budget in seconds"""
+        return 1.0 / self.target_fps
+    
+    @property
+    def current(self):
+        """Settings for the active quality level"""
+        return self.LEVELS[self.level]
+    
+    def configure(self, enabled, target_fps):
+        """Apply GUI settings; returns True if the quality level changed"""
+        if target_fps != self.target_fps:
+            self.target_fps = target_fps
+            self.samples.clear()
+            self.clear_cost_ratios()
+        
+        if enabled == self.enabled:
+            return False
+        
+        self.enabled = enabled
+        self.clear_cost_ratios()
+        if not enabled and self.level != 0:
+            # Back to full quality when the governor is switched off
+            self.set_level(0)
+            return True
+        
+        # Don't reuse frame times from before the governor was toggled
+        self.samples.clear()
+        self.last_change = time.time()
+        return False
+    
+    def clear_cost_ratios(self):
+        """Forget all measured cost ratios"""
+        self.cost_ratios.clear()
+        self.ratio_lifetimes.clear()
+        self.pending_step_down = None
+    
+    def store_cost_ratio(self, level, ratio):
+        """Store a clamped cost ratio for a level, backing off its lifetime on each re-measurement"""
+        ratio = max(1.0, min(self.MAX_COST_RATIO, ratio))
+        lifetime = self.ratio_lifetimes.get(level, self.upgrade_cooldown * 4)
+        self.cost_ratios[level] = (ratio, time.time() + lifetime)
+        self.ratio_lifetimes[level] = min(lifetime * 2, self.upgrade_cooldown * 16)
+    
+    def cost_ratio(self, level):
+        """Cost ratio of a level over the one below it, or 1.0 if unknown or expired"""
+        entry = self.cost_ratios.get(level)
+        if entry is None:
+            return 1.0
+        ratio, expires_at = entry
+        if time.time() >= expires_at:
+            del self.cost_ratios[level]
+            return 1.0
+        return ratio
+    
+    def set_level(self, level):
+        """Switch to a quality level and restart the measurement window"""
+        self.level = max(0, min(len(self.LEVELS) - 1, level))
+        self.samples.clear()
+        self.last_change = time.time()
+        self.pending_step_down = None
+    
+    def record(self, processing_time):
+        """Record one frame's processing time; returns True if the quality level changed"""
+        if not self.enabled:
+            return False
+        
+        self.samples.append(processing_time)
+        
+        # Wait for a full window so a single slow frame can't trigger a change
+        if len(self.samples) < self.samples.maxlen:
+            return False
+        
+        average = sum(self.samples) / len(self.samples)
+        since_change = time.time() - self.last_change
+        
+        # First full window after a step down: remember how much more the
+        # previous level cost than this one
+        if self.pending_step_down is not None:
+            previous_level, previous_average = self.pending_step_down
+            if average > 0:
+                self.store_cost_ratio(previous_level, previous_average / average)
+            self.pending_step_down = None
+        
+        # Predict what the next level up would cost under the current load
+        predicted = average * self.cost_ratio(self.level - 1)
+        
+        if average > self.budget and self.level < len(self.LEVELS) - 1:
+            if since_change >= self.degrade_cooldown:
+                previous_level = self.level
+                self.set_level(self.level + 1)
+                self.pending_step_down = (previous_level, average)
+                print(f"Quality lowered to {self.current['name']} "
+                      f"(avg {average * 1000:.1f} ms > budget {self.budget * 1000:.1f} ms)")
+                return True
+        elif predicted < self.budget * self.upgrade_ratio and self.level > 0:
+            if since_change >= self.upgrade_cooldown:
+                self.set_level(self.level - 1)
+                print(f"Quality raised to {self.current['name']} "
+                      f"(predicted {predicted * 1000:.1f} ms < {self.upgrade_ratio:.0%} of budget)")
+                return True
+        return False
+
 class SettingsWindow:
     def __init__(self, settings_queue):
         self.root = tk.Tk()
         self.root.title("Face Tracker Settings")
-        self.root.geometry("400x600")
+        self.root.geometry("400x720")
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         # Queue for sending settings updates to the tracking thread
@@ -27,6 +183,8 @@ class SettingsWindow:
         self.smoothing_frames = tk.IntVar(value=1)
         self.show_face_mesh = tk.BooleanVar(value=False)
         self.controller_stick = tk.StringVar(value="right")  # 'left' or 'right'
+        self.adaptive_quality = tk.BooleanVar(value=True)
+        self.target_fps = tk.IntVar(value=30)
         
         # Setup variable tracing for real-time updates
         self.x_sensitivity.trace_add("write", self.settings_changed)
@@ -36,6 +194,8 @@ class SettingsWindow:
         self.smoothing_frames.trace_add("write", self.settings_changed)
         self.show_face_mesh.trace_add("write", self.settings_changed)
         self.controller_stick.trace_add("write", self.settings_changed)
+        self.adaptive_quality.trace_add("write", self.settings_changed)
+        self.target_fps.trace_add("write", self.settings_changed)
         
         # Create UI
         self.create_ui()
@@ -129,6 +289,19 @@ class SettingsWindow:
                                         variable=self.show_face_mesh)
         show_mesh_check.grid(row=1, column=0, columnspan=3, sticky=tk.W, pady=5)
         
+        # Adaptive quality
+        adaptive_check = ttk.Checkbutton(advanced_frame, text="Adaptive Quality",
+                                       variable=self.adaptive_quality)
+        adaptive_check.grid(row=2, column=0, columnspan=3, sticky=tk.W, pady=5)
+        
+        # Target FPS for adaptive quality
+        ttk.Label(advanced_frame, text="Target FPS:").grid(row=3, column=0, sticky=tk.W, pady=5)
+        target_fps_scale = ttk.Scale(advanced_frame, from_=15, to=60, orient=tk.HORIZONTAL,
+                                   variable=self.target_fps, length=200)
+        target_fps_scale.grid(row=3, column=1, padx=10)
+        target_fps_value_label = ttk.Label(advanced_frame, textvariable=self.target_fps)
+        target_fps_value_label.grid(row=3, column=2)
+        
         # Control buttons
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.pack(pady=10)
@@ -151,9 +324,11 @@ class SettingsWindow:
         
         self.fps_var = tk.StringVar(value="FPS: --")
         self.orientation_var = tk.StringVar(value="Yaw: -- Pitch: --")
+        self.quality_var = tk.StringVar(value="Quality: --")
         
         ttk.Label(self.info_frame, textvariable=self.fps_var).pack(anchor=tk.W, pady=2)
         ttk.Label(self.info_frame, textvariable=self.orientation_var).pack(anchor=tk.W, pady=2)
+        ttk.Label(self.info_frame, textvariable=self.quality_var).pack(anchor=tk.W, pady=2)
         
         # Instructions
         instructions = ttk.Label(main_frame, text="Instructions:\n"
@@ -207,6 +382,10 @@ class SettingsWindow:
         self.fps_var.set(f"FPS: {fps:.1f}")
         self.orientation_var.set(f"Yaw: {yaw:.2f} Pitch: {pitch:.2f}")
     
+    def update_quality(self, quality):
+        """Update the information display with the current quality level"""
+        self.quality_var.set(f"Quality: {quality}")
+    
     def get_settings(self):
         """Get current settings values"""
         return {
@@ -216,7 +395,9 @@ class SettingsWindow:
             'invert_y': self.invert_y.get(),
             'smoothing_frames': int(self.smoothing_frames.get()),
             'show_face_mesh': self.show_face_mesh.get(),
-            'controller_stick': self.controller_stick.get()
+            'controller_stick': self.controller_stick.get(),
+            'adaptive_quality': self.adaptive_quality.get(),
+            'target_fps': int(self.target_fps.get())
         }
     
     def run(self):
@@ -229,15 +410,13 @@ class HeadOrientationController:
         self.info_queue = info_queue
         self.settings = None
         
+        # Adaptive quality governor, starts at full quality
+        self.governor = QualityGovernor()
+        self.quality = self.governor.current
+        
         # Configure face mesh with optimized settings
         self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
-            static_image_mode=False
-        )
+        self.face_mesh = self.create_face_mesh(self.quality['refine_landmarks'])
         
         # Initialize virtual Xbox controller 
         # Using vgamepad to create an Xbox 360 virtual controller
@@ -279,14 +458,44 @@ class HeadOrientationController:
         self.last_time = time.time()
         self.fps = 0
         
+        # Frame counter for preview rate limiting
+        self.frame_count = 0
+        
         # Control flags
         self.running = False
         self.exit_requested = False
     
+    def create_face_mesh(self, refine_landmarks):
+        """Create a FaceMesh instance with optimized settings"""
+        return self.mp_face_mesh.FaceMesh(
+            max_num_faces=1,
+            refine_landmarks=refine_landmarks,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5,
+            static_image_mode=False
+        )
+    
+    def apply_quality(self):
+        """Apply the governor's current quality level to the tracking pipeline"""
+        new_quality = self.governor.current
+        
+        # FaceMesh can't toggle landmark refinement in place, so rebuild it
+        if new_quality['refine_landmarks'] != self.quality['refine_landmarks']:
+            self.face_mesh.close()
+            self.face_mesh = self.create_face_mesh(new_quality['refine_landmarks'])
+        
+        self.quality = new_quality
+        self.send_quality()
+    
+    def send_quality(self):
+        """Send the current quality level to the GUI"""
+        self.info_queue.put({'quality': self.quality['name']})
+    
     def update_settings(self, new_settings):
         """Update controller settings with new values"""
         if not self.settings:
             self.settings = new_settings
+            self.update_governor()
             return
         
         # If smoothing frames changed, resize the buffers
@@ -306,6 +515,16 @@ class HeadOrientationController:
         
         # Update all settings
         self.settings.update(new_settings)
+        self.update_governor()
+    
+    def update_governor(self):
+        """Pass adaptive quality settings on to the governor"""
+        changed = self.governor.configure(
+            self.settings.get('adaptive_quality', True),
+            self.settings.get('target_fps', 30)
+        )
+        if changed:
+            self.apply_quality()
     
     def calculate_head_orientation(self, face_landmarks):
         """Calculate head orientation (yaw and pitch) based on facial landmarks"""
@@ -447,6 +666,7 @@ class HeadOrientationController:
                     if command == "start":
                         self.running = True
                         self.update_settings(message)
+                        self.send_quality()
                     elif command == "stop":
                         self.running = False
                         # Reset controller when stopped
@@ -492,6 +712,11 @@ class HeadOrientationController:
                     self.fps = 1.0 / dt
                 self.last_time = current_time
                 
+                # Only show every Nth frame in the preview at lower quality levels
+                self.frame_count += 1
+                show_preview = self.frame_count % self.quality['preview_interval'] == 0
+                draw_overlay = show_preview and self.quality['overlay']
+                
                 rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 results = self.face_mesh.process(rgb_frame)
                 
@@ -526,32 +751,34 @@ class HeadOrientationController:
                             'pitch': final_pitch
                         })
                         
-                        # Draw face mesh if enabled
-                        if self.settings['show_face_mesh']:
-                            for landmark in face_landmarks:
-                                x = int(landmark.x * frame.shape[1])
-                                y = int(landmark.y * frame.shape[0])
-                                cv2.circle(frame, (x, y), 1, (0, 255, 0), -1)
+                        # Skip drawing when the overlay is off or this frame isn't previewed
+                        if draw_overlay:
+                            # Draw face mesh if enabled
+                            if self.settings['show_face_mesh']:
+                                for landmark in face_landmarks:
+                                    x = int(landmark.x * frame.shape[1])
+                                    y = int(landmark.y * frame.shape[0])
+                                    cv2.circle(frame, (x, y), 1, (0, 255, 0), -1)
                         
-                        # Visualize head orientation vectors
-                        nose_x = int(face_landmarks[self.NOSE_TIP].x * frame.shape[1])
-                        nose_y = int(face_landmarks[self.NOSE_TIP].y * frame.shape[0])
+                            # Visualize head orientation vectors
+                            nose_x = int(face_landmarks[self.NOSE_TIP].x * frame.shape[1])
+                            nose_y = int(face_landmarks[self.NOSE_TIP].y * frame.shape[0])
                         
-                        # Draw yaw vector (horizontal)
-                        yaw_end_x = int(nose_x + final_yaw * 50)
-                        cv2.line(frame, (nose_x, nose_y), (yaw_end_x, nose_y), (255, 0, 0), 2)
+                            # Draw yaw vector (horizontal)
+                            yaw_end_x = int(nose_x + final_yaw * 50)
+                            cv2.line(frame, (nose_x, nose_y), (yaw_end_x, nose_y), (255, 0, 0), 2)
                         
-                        # Draw pitch vector (vertical)
-                        pitch_end_y = int(nose_y + final_pitch * 50)
-                        cv2.line(frame, (nose_x, nose_y), (nose_x, pitch_end_y), (0, 0, 255), 2)
+                            # Draw pitch vector (vertical)
+                            pitch_end_y = int(nose_y + final_pitch * 50)
+                            cv2.line(frame, (nose_x, nose_y), (nose_x, pitch_end_y), (0, 0, 255), 2)
                         
-                        # Display info
-                        cv2.putText(frame, f"FPS: {self.fps:.1f} | {self.settings['controller_stick'].title()} Stick", 
-                                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                        cv2.putText(frame, f"Sensitivity - Yaw: {self.settings['x_sensitivity']:.1f} Pitch: {self.settings['y_sensitivity']:.1f}", 
-                                   (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                        cv2.putText(frame, f"Smoothing: {self.settings['smoothing_frames']} frames", 
-                                   (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                            # Display info
+                            cv2.putText(frame, f"FPS: {self.fps:.1f} | {self.settings['controller_stick'].title()} Stick", 
+                                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                            cv2.putText(frame, f"Sensitivity - Yaw: {self.settings['x_sensitivity']:.1f} Pitch: {self.settings['y_sensitivity']:.1f}", 
+                                       (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                            cv2.putText(frame, f"Smoothing: {self.settings['smoothing_frames']} frames", 
+                                       (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
                 else:
                     # Reset selected stick to center when no face is detected
                     if self.settings['controller_stick'] == 'left':
@@ -564,17 +791,23 @@ class HeadOrientationController:
                     self.gamepad.update()
                     
                     # Display warning that face is not detected
-                    cv2.putText(frame, "No face detected", (10, 30), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                    cv2.putText(frame, "Controller stick centered", (10, 60),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+                    if draw_overlay:
+                        cv2.putText(frame, "No face detected", (10, 30), 
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+                        cv2.putText(frame, "Controller stick centered", (10, 60),
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
                 
-                cv2.imshow('Head Orientation Controller', frame)
+                if show_preview:
+                    cv2.imshow('Head Orientation Controller', frame)
+                    
+                    # Check for key press to quit
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        self.running = False
+                        self.exit_requested = True
                 
-                # Check for key press to quit
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    self.running = False
-                    self.exit_requested = True
+                # Let the governor adjust quality based on this frame's processing time
+                if self.governor.record(time.time() - current_time):
+                    self.apply_quality()
             else:
                 # Small delay when not running to prevent CPU overuse
                 time.sleep(0.1)
@@ -608,7 +841,10 @@ def update_gui(settings_window, info_queue):
             # Non-blocking check for new info
             try:
                 info = info_queue.get(block=False)
-                settings_window.update_info(info['fps'], info['yaw'], info['pitch'])
+                if 'fps' in info:
+                    settings_window.update_info(info['fps'], info['yaw'], info['pitch'])
+                if 'quality' in info:
+                    settings_window.update_quality(info['quality'])
                 info_queue.task_done()
             except queue.Empty:
                 pass